@@ -1,12 +1,14 @@
 import json
-import boto3
+import botocore.session
 import os
+import hashlib
+import hmac
 from datetime import datetime, timezone
-import uuid
-from botocore.exceptions import ClientError
+from urllib.parse import quote
 
-# Inicializar cliente S3
-s3_client = boto3.client('s3')
+# Sesión botocore para credenciales y región (el firmado SigV4 se hace en este módulo);
+# evita cargar boto3 y su capa de resources, que no se usa
+aws_session = botocore.session.get_session()
 
 # Configuración
 ALLOWED_FILE_TYPES = {
@@ -21,6 +23,26 @@ ALLOWED_FILE_TYPES = {
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 PRESIGNED_URL_EXPIRATION = 3600  # 1 hora
 
+# Headers CORS compartidos por todas las respuestas
+_CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization'
+}
+
+# Decoder/encoder JSON reutilizables: instancias únicas de json (json.dumps con
+# separators crea un encoder por llamada). Esta función corre sin layer, así que
+# no hay orjson en producción
+_DECODE = json.JSONDecoder().decode
+_ENCODE = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+# Extensiones permitidas para mensajes de error (se calcula una sola vez)
+_ALLOWED_EXTS_MSG = ', '.join(sorted(ALLOWED_FILE_TYPES))
+
+# Clave de firma SigV4 cacheada: (access_key, fecha, región, clave)
+_signing_key_cache = None
+
 def lambda_handler(event, context):
     """
     Lambda function para generar URLs prefirmadas para subir archivos a S3
@@ -49,31 +71,39 @@ def lambda_handler(event, context):
         environment = os.environ.get('ENVIRONMENT', 'dev')
         bucket_name = os.environ.get('S3_BUCKET_NAME')
         
+        # Timestamps de la invocación (una sola lectura del reloj)
+        now = datetime.now(timezone.utc)
+        ts_iso = now.isoformat()
+        ts_key = now.strftime('%Y%m%d_%H%M%S')
+        
         if not bucket_name:
             return create_error_response(
                 message="S3 bucket not configured",
                 error_code="BUCKET_NOT_CONFIGURED",
                 status_code=500,
-                environment=environment
+                environment=environment,
+                timestamp=ts_iso
             )
         
         # Parsear el body del request
         if event.get('body'):
             try:
-                body = json.loads(event['body'])
+                body = _DECODE(event['body'])
             except json.JSONDecodeError:
                 return create_error_response(
                     message="Invalid JSON in request body",
                     error_code="INVALID_JSON",
                     status_code=400,
-                    environment=environment
+                    environment=environment,
+                    timestamp=ts_iso
                 )
         else:
             return create_error_response(
                 message="Request body is required",
                 error_code="MISSING_BODY",
                 status_code=400,
-                environment=environment
+                environment=environment,
+                timestamp=ts_iso
             )
         
         # Validar estructura del request
@@ -83,7 +113,8 @@ def lambda_handler(event, context):
                 message="Files array is required and must contain at least one file",
                 error_code="INVALID_FILES_ARRAY",
                 status_code=400,
-                environment=environment
+                environment=environment,
+                timestamp=ts_iso
             )
         
         # Validar que no exceda el límite de archivos (máximo 5 según tu formulario)
@@ -92,12 +123,13 @@ def lambda_handler(event, context):
                 message="Maximum 5 files allowed per request",
                 error_code="TOO_MANY_FILES",
                 status_code=400,
-                environment=environment
+                environment=environment,
+                timestamp=ts_iso
             )
         
-        # Procesar cada archivo y generar URLs prefirmadas
-        upload_urls = []
+        # Paso 1: validar todos los archivos antes de firmar ninguna URL
         validation_errors = []
+        valid_files = []
         
         for i, file_info in enumerate(files):
             # Validar campos requeridos
@@ -106,18 +138,26 @@ def lambda_handler(event, context):
                 validation_errors.append(validation_error)
                 continue
             
+            # Leer los campos una sola vez; el resto del flujo usa la tupla
+            field_name, file_name, file_size, content_type = (
+                file_info['field_name'], file_info['file_name'],
+                file_info['file_size'], file_info['content_type']
+            )
+            
             # Validar tipo de archivo
-            file_extension = file_info['file_name'].split('.')[-1].lower()
-            if file_extension not in ALLOWED_FILE_TYPES:
+            _, file_extension = os.path.splitext(file_name)
+            file_extension = file_extension[1:].lower()
+            expected_content_type = ALLOWED_FILE_TYPES.get(file_extension)
+            if expected_content_type is None:
                 validation_errors.append({
                     "file_index": i,
                     "field": "file_name",
-                    "message": f"File type '{file_extension}' not allowed. Allowed types: {list(ALLOWED_FILE_TYPES.keys())}"
+                    "message": f"File type '{file_extension}' not allowed. Allowed types: {_ALLOWED_EXTS_MSG}"
                 })
                 continue
             
             # Validar tamaño del archivo
-            if file_info['file_size'] > MAX_FILE_SIZE:
+            if file_size > MAX_FILE_SIZE:
                 validation_errors.append({
                     "file_index": i,
                     "field": "file_size", 
@@ -126,8 +166,7 @@ def lambda_handler(event, context):
                 continue
             
             # Validar content type
-            expected_content_type = ALLOWED_FILE_TYPES[file_extension]
-            if file_info['content_type'] != expected_content_type:
+            if content_type != expected_content_type:
                 validation_errors.append({
                     "file_index": i,
                     "field": "content_type",
@@ -135,53 +174,52 @@ def lambda_handler(event, context):
                 })
                 continue
             
-            # Generar key único para S3
-            unique_id = str(uuid.uuid4())
-            timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
-            s3_key = f"uploads/{file_info['field_name']}/{timestamp}_{unique_id}_{file_info['file_name']}"
-            
-            # Generar URL prefirmada
-            try:
-                presigned_url = s3_client.generate_presigned_url(
-                    'put_object',
-                    Params={
-                        'Bucket': bucket_name,
-                        'Key': s3_key,
-                        'ContentType': file_info['content_type'],
-                        'ContentLength': file_info['file_size']
-                    },
-                    ExpiresIn=PRESIGNED_URL_EXPIRATION
-                )
-                
-                upload_urls.append({
-                    "field_name": file_info['field_name'],
-                    "file_name": file_info['file_name'],
-                    "s3_key": s3_key,
-                    "upload_url": presigned_url,
-                    "expires_in": PRESIGNED_URL_EXPIRATION,
-                    "content_type": file_info['content_type'],
-                    "max_file_size": file_info['file_size']
-                })
-                
-            except ClientError as e:
-                return create_error_response(
-                    message="Failed to generate presigned URL",
-                    error_code="S3_PRESIGN_ERROR",
-                    status_code=500,
-                    environment=environment,
-                    details={"aws_error": str(e)}
-                )
+            valid_files.append((field_name, file_name, file_size, content_type))
         
-        # Si hay errores de validación, retornarlos
+        # Si hay errores de validación, retornarlos sin generar URLs
         if validation_errors:
             return create_error_response(
                 message="Validation errors found",
                 error_code="VALIDATION_ERROR",
                 status_code=400,
                 environment=environment,
-                details={"validation_errors": validation_errors}
+                details={"validation_errors": validation_errors},
+                timestamp=ts_iso
             )
         
+        # Paso 2: generar URLs prefirmadas (todas comparten la misma clave de firma)
+        credentials = aws_session.get_credentials()
+        if credentials is None:
+            return create_error_response(
+                message="Failed to generate presigned URL",
+                error_code="S3_PRESIGN_ERROR",
+                status_code=500,
+                environment=environment,
+                details={"aws_error": "AWS credentials not available"},
+                timestamp=ts_iso
+            )
+        credentials = credentials.get_frozen_credentials()
+        region = aws_session.get_config_variable('region') or 'us-east-1'
+        
+        upload_urls = []
+        for field_name, file_name, file_size, content_type in valid_files:
+            # Generar key único para S3
+            unique_id = os.urandom(16).hex()
+            s3_key = f"uploads/{field_name}/{ts_key}_{unique_id}_{file_name}"
+            
+            presigned_url = generate_upload_url(
+                bucket_name, s3_key, content_type, file_size, credentials, region, now
+            )
+            upload_urls.append({
+                "field_name": field_name,
+                "file_name": file_name,
+                "s3_key": s3_key,
+                "upload_url": presigned_url,
+                "expires_in": PRESIGNED_URL_EXPIRATION,
+                "content_type": content_type,
+                "max_file_size": file_size
+            })
+        
         # Retornar respuesta exitosa
         return create_success_response(
             message="Upload URLs generated successfully",
@@ -190,7 +228,8 @@ def lambda_handler(event, context):
                 "bucket_name": bucket_name,
                 "total_files": len(upload_urls)
             },
-            environment=environment
+            environment=environment,
+            timestamp=ts_iso
         )
         
     except Exception as e:
@@ -202,6 +241,71 @@ def lambda_handler(event, context):
             details={"error": str(e)}
         )
 
+def generate_upload_url(bucket_name, s3_key, content_type, content_length, credentials, region, now):
+    """
+    Genera la URL prefirmada PUT (SigV4 por query string) para un archivo.
+    Equivale a generate_presigned_url('put_object', ...) de boto3 con
+    ContentType y ContentLength, usando direccionamiento path-style porque
+    el nombre del bucket contiene puntos.
+    """
+    host = f"s3.{region}.amazonaws.com"
+    canonical_uri = f"/{bucket_name}/{quote(s3_key, safe='/')}"
+    headers = {
+        'content-length': str(content_length),
+        'content-type': content_type,
+        'host': host
+    }
+    return presign_url('PUT', host, canonical_uri, headers, credentials, region, now,
+                       PRESIGNED_URL_EXPIRATION)
+
+def presign_url(method, host, canonical_uri, headers, credentials, region, now, expires_in):
+    """Firma una URL de S3 con AWS Signature Version 4 en el query string"""
+    amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+    date_stamp = amz_date[:8]
+    scope = f"{date_stamp}/{region}/s3/aws4_request"
+    signed_headers = ';'.join(sorted(headers))
+    
+    query = {
+        'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+        'X-Amz-Credential': f"{credentials.access_key}/{scope}",
+        'X-Amz-Date': amz_date,
+        'X-Amz-Expires': str(expires_in),
+        'X-Amz-SignedHeaders': signed_headers
+    }
+    if credentials.token:
+        query['X-Amz-Security-Token'] = credentials.token
+    canonical_query = '&'.join(
+        f"{quote(k, safe='')}={quote(v, safe='')}" for k, v in sorted(query.items())
+    )
+    canonical_headers = ''.join(f"{k}:{headers[k].strip()}\n" for k in sorted(headers))
+    
+    canonical_request = '\n'.join([
+        method, canonical_uri, canonical_query, canonical_headers, signed_headers, 'UNSIGNED-PAYLOAD'
+    ])
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256', amz_date, scope,
+        hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+    ])
+    signing_key = get_signing_key(credentials, date_stamp, region)
+    signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+    
+    return f"https://{host}{canonical_uri}?{canonical_query}&X-Amz-Signature={signature}"
+
+def get_signing_key(credentials, date_stamp, region):
+    """Deriva la clave de firma SigV4 y la cachea por access key, día y región"""
+    global _signing_key_cache
+    cache = _signing_key_cache
+    if cache and cache[:3] == (credentials.access_key, date_stamp, region):
+        return cache[3]
+    
+    k_date = hmac.new(f"AWS4{credentials.secret_key}".encode('utf-8'), date_stamp.encode('utf-8'), hashlib.sha256).digest()
+    k_region = hmac.new(k_date, region.encode('utf-8'), hashlib.sha256).digest()
+    k_service = hmac.new(k_region, b's3', hashlib.sha256).digest()
+    k_signing = hmac.new(k_service, b'aws4_request', hashlib.sha256).digest()
+    
+    _signing_key_cache = (credentials.access_key, date_stamp, region, k_signing)
+    return k_signing
+
 def validate_file_info(file_info, index):
     """Valida la información de cada archivo"""
     required_fields = ['field_name', 'file_name', 'file_size', 'content_type']
@@ -223,7 +327,8 @@ def validate_file_info(file_info, index):
         }
     
     # Validar que el nombre del archivo tenga extensión
-    if '.' not in file_info['file_name']:
+    _, extension = os.path.splitext(file_info['file_name'])
+    if not extension[1:]:
         return {
             "file_index": index,
             "field": "file_name", 
@@ -232,14 +337,14 @@ def validate_file_info(file_info, index):
     
     return None
 
-def create_success_response(message, data, environment, user_id=None):
+def create_success_response(message, data, environment, user_id=None, timestamp=None):
     """Crear respuesta de éxito estándar"""
     response_body = {
         "success": True,
         "message": message,
         "data": data,
         "environment": environment,
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": timestamp or datetime.now(timezone.utc).isoformat()
     }
     
     if user_id:
@@ -247,23 +352,18 @@ def create_success_response(message, data, environment, user_id=None):
     
     return {
         'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type, Authorization'
-        },
-        'body': json.dumps(response_body)
+        'headers': _CORS_HEADERS,
+        'body': _ENCODE(response_body)
     }
 
-def create_error_response(message, error_code, status_code, environment, details=None):
+def create_error_response(message, error_code, status_code, environment, details=None, timestamp=None):
     """Crear respuesta de error estándar"""
     response_body = {
         "success": False,
         "message": message,
         "error_code": error_code,
         "environment": environment,
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": timestamp or datetime.now(timezone.utc).isoformat()
     }
     
     if details:
@@ -271,11 +371,6 @@ def create_error_response(message, error_code, status_code, environment, details
     
     return {
         'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type, Authorization'
-        },
-        'body': json.dumps(response_body)
+        'headers': _CORS_HEADERS,
+        'body': _ENCODE(response_body)
     }
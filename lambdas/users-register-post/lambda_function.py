@@ -1,343 +1,465 @@
 import os
-import boto3
 import pymysql
 from datetime import datetime
+import functools
 import uuid
 import json
 import logging
+import re
+import socket
+import string
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Serialización JSON: orjson (C/Rust) si está en el layer, json estándar si no.
+# orjson.JSONDecodeError hereda de json.JSONDecodeError
+if orjson is not None:
+    _json_loads = orjson.loads
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode('utf-8')
+else:
+    _json_loads = json.loads
+    _json_dumps = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
 # Configuración desde variables de entorno
-DB_HOST = os.environ.get('DB_HOST')
-DB_USER = os.environ.get('DB_USER')
-DB_PASS = os.environ.get('DB_PASS')
-DB_NAME = os.environ.get('DB_NAME', 'impulsame_dev')
+# (credenciales de MySQL: ver _db_creds)
 AWS_BUCKET = os.environ.get('AWS_BUCKET_USER_DATOS')
 
+ER_DUP_ENTRY = 1062  # Código MySQL de clave duplicada
+
+# Índices UNIQUE de users -> campo en conflicto (nombre exacto del índice)
+_DUP_KEY_FIELDS = {'email': 'email', 'ci': 'ci'}
+
+MAX_BODY_SIZE = 64 * 1024  # 64KB: el registro solo recibe campos de texto
+
+# Campos obligatorios del registro (solo texto)
+_REQUIRED_FIELDS = ('email', 'full_name', 'ci', 'phone1')
+
+# Formato mínimo de email: algo@dominio.tld, sin espacios ni '@' repetidas
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# CORS headers (compartidos por todas las respuestas; dict plano porque el
+# runtime de Lambda serializa la respuesta con json)
+_CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,x-requested-with',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+    'Access-Control-Allow-Credentials': 'true'
+}
+
+_ERROR_CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+}
+
+_OPTIONS_RESPONSE = {
+    'statusCode': 200,
+    'headers': _CORS_HEADERS,
+    'body': _json_dumps({'message': 'CORS preflight successful'})
+}
+
+# Cuerpos de error estáticos, serializados una sola vez al importar
+_BODY_REQUIRED_ERROR = _json_dumps({'error': 'Request body is required'})
+_BODY_TOO_LARGE_ERROR = _json_dumps({'error': f'Request body exceeds {MAX_BODY_SIZE} bytes'})
+_INVALID_EMAIL_ERROR = _json_dumps({'error': 'Valid email is required'})
+_INVALID_TEXT_FIELDS_ERROR = _json_dumps({'error': 'full_name and ci must be strings'})
+_REGISTRATION_FAILED_ERROR = _json_dumps({
+    'error': 'Registration failed',
+    'message': 'User registration could not be completed'
+})
+
+# Respuestas 409 por campo duplicado
+_CONFLICT_ERRORS = {
+    'email': _json_dumps({
+        'error': 'Email already registered',
+        'message': 'A user with this email already exists'
+    }),
+    'ci': _json_dumps({
+        'error': 'CI already registered',
+        'message': 'A user with this CI already exists'
+    })
+}
+
+# Cuerpo del 201: las claves son fijas, solo se interpolan los valores ya serializados
+_SUCCESS_BODY_TMPL = (
+    '{"success":true,"user_id":%s,"message":"User registered successfully",'
+    '"data":{"email":%s,"full_name":%s,"ci":%s,"phone1":%s,"folder_name":%s,'
+    '"files_uploaded":false,"next_step":"Upload documents using /users/upload-documents endpoint"},'
+    '"environment":%s,"timestamp":%s}'
+)
+
+# Tabla para clean_name: borra todo ASCII que no sea letra o espacio
+_CLEAN_NAME_TABLE = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if chr(c) not in string.ascii_letters + ' '
+))
+
+# SQL para insertar usuario (parámetros posicionales en el orden de _INSERT_USER_COLUMNS)
+_INSERT_USER_COLUMNS = (
+    'id', 'email', 'full_name', 'birth_date', 'ci', 'phone1', 'phone2', 'address',
+    'instagram', 'facebook', 'tiktok', 'ref1_name', 'ref1_relation', 'ref2_name', 'ref2_relation',
+    'monthly_income', 'activity_type', 'position', 'id_file_path', 'rif_file_path',
+    'ref1_id_path', 'ref2_id_path', 'work_cert_path', 'files_uploaded', 'files_upload_date',
+    'created_at', 'updated_at'
+)
+
+_INSERT_USER_SQL = "INSERT INTO users ({}) VALUES ({})".format(
+    ', '.join(_INSERT_USER_COLUMNS),
+    ', '.join(['%s'] * len(_INSERT_USER_COLUMNS))
+)
+
+# Conexión MySQL cacheada por contenedor (ver get_database_connection)
+_CONN = None
+
+# Fecha ddmmaaaa del día en curso; solo cambia una vez al día (ver folder_date_str)
+_DATE_CACHE = [None, None]
+
 def lambda_handler(event, context):
+    global _CONN
     try:
-        logger.info(f"Event received: {json.dumps(event)}")
-        
-        # CORS headers
-        cors_headers = {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,x-requested-with',
-            'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
-            'Access-Control-Allow-Credentials': 'true'
-        }
-        
-        # Handle OPTIONS request for CORS preflight
+        # Handle OPTIONS request for CORS preflight (respuesta precalculada)
         if event.get('httpMethod') == 'OPTIONS':
-            logger.info("Handling CORS preflight request")
-            return {
-                'statusCode': 200,
-                'headers': cors_headers,
-                'body': json.dumps({'message': 'CORS preflight successful'})
-            }
+            return _OPTIONS_RESPONSE
+        
+        logger.info(
+            "Event received: method=%s path=%s body_size=%d",
+            event.get('httpMethod'), event.get('path'), len(event.get('body') or '')
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Full event: %s", _json_dumps(event))
         
         # Check if body exists
         if not event.get('body'):
             logger.warning("No body in request")
             return {
                 'statusCode': 400,
-                'headers': cors_headers,
-                'body': json.dumps({'error': 'Request body is required'})
+                'headers': _CORS_HEADERS,
+                'body': _BODY_REQUIRED_ERROR
+            }
+        
+        # Rechazar cuerpos desproporcionados antes de parsearlos
+        if isinstance(event['body'], str) and len(event['body']) > MAX_BODY_SIZE:
+            logger.warning("Request body too large: %d bytes", len(event['body']))
+            return {
+                'statusCode': 413,
+                'headers': _CORS_HEADERS,
+                'body': _BODY_TOO_LARGE_ERROR
             }
         
         # Parse request body
         try:
             if isinstance(event['body'], str):
-                body = json.loads(event['body'])
+                body = _json_loads(event['body'])
             else:
                 body = event['body']
         except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {str(e)}")
+            logger.error("JSON parsing error: %s", e)
             return {
                 'statusCode': 400,
-                'headers': cors_headers,
-                'body': json.dumps({'error': f'Invalid JSON: {str(e)}'})
+                'headers': _CORS_HEADERS,
+                'body': _json_dumps({'error': f'Invalid JSON: {str(e)}'})
             }
         
         # Validate required fields (solo campos de texto)
-        required_fields = ['email', 'full_name', 'ci', 'phone1']
-        missing_fields = [field for field in required_fields if not body.get(field)]
-        
-        if missing_fields:
-            logger.warning(f"Missing required fields: {missing_fields}")
+        if not all(body.get(field) for field in _REQUIRED_FIELDS):
+            missing_fields = [field for field in _REQUIRED_FIELDS if not body.get(field)]
+            logger.warning("Missing required fields: %s", missing_fields)
             return {
                 'statusCode': 400,
-                'headers': cors_headers,
-                'body': json.dumps({
+                'headers': _CORS_HEADERS,
+                'body': _json_dumps({
                     'error': f'Missing required fields: {", ".join(missing_fields)}'
                 })
             }
         
+        # full_name y ci alimentan el nombre de carpeta, que se arma después del
+        # INSERT: deben ser texto para que ese paso no pueda fallar
+        if not isinstance(body['full_name'], str) or not isinstance(body['ci'], str):
+            return {
+                'statusCode': 400,
+                'headers': _CORS_HEADERS,
+                'body': _INVALID_TEXT_FIELDS_ERROR
+            }
+        
         # Validate email format
         email = body.get('email', '').strip().lower()
-        if not email or '@' not in email:
+        if not _EMAIL_RE.match(email):
             return {
                 'statusCode': 400,
-                'headers': cors_headers,
-                'body': json.dumps({'error': 'Valid email is required'})
+                'headers': _CORS_HEADERS,
+                'body': _INVALID_EMAIL_ERROR
             }
         
         # Generate user ID
-        user_id = str(uuid.uuid4())
-        logger.info(f"Generated user ID: {user_id}")
-        
-        # Process user data (solo texto, sin archivos)
-        user_data = prepare_user_data(body, user_id)
+        user_id = uuid.uuid4().hex
+        logger.info("Generated user ID: %s", user_id)
         
-        # Generate folder name for future file uploads
-        folder_name = generate_folder_name(body['ci'], body['full_name'])
-        logger.info(f"Generated folder name for future uploads: {folder_name}")
+        # Fecha de la invocación, compartida por todos los campos que la usan
+        now = datetime.now()
+        date_str = folder_date_str(now)
         
-        # Database transaction
-        connection = None
+        # Process user data (solo texto, sin archivos)
+        user_params = prepare_user_data(body, user_id, now)
         
+        # Database operations (autocommit: cada sentencia es atómica por sí sola)
         try:
             # Get database connection
             connection = get_database_connection()
             
-            # Check if email already exists
-            if email_exists(connection, email):
-                return {
-                    'statusCode': 409,
-                    'headers': cors_headers,
-                    'body': json.dumps({
-                        'error': 'Email already registered',
-                        'message': 'A user with this email already exists'
-                    })
-                }
+            # Check if email or CI already exist (una sola consulta)
+            conflict = find_existing_user(connection, email, body['ci'])
             
-            # Check if CI already exists
-            if ci_exists(connection, body['ci']):
+            # Insert user into database; si otro registro concurrente ganó la
+            # carrera entre la verificación y el INSERT, el índice UNIQUE lo rechaza
+            if not conflict:
+                try:
+                    insert_user_to_database(connection, user_params)
+                except pymysql.IntegrityError as e:
+                    conflict = duplicate_key_field(e)
+                    if not conflict:
+                        raise
+            
+            if conflict:
                 return {
                     'statusCode': 409,
-                    'headers': cors_headers,
-                    'body': json.dumps({
-                        'error': 'CI already registered',
-                        'message': 'A user with this CI already exists'
-                    })
+                    'headers': _CORS_HEADERS,
+                    'body': _CONFLICT_ERRORS[conflict]
                 }
+            logger.info("User %s registered successfully", email)
             
-            # Insert user into database
-            insert_user_to_database(connection, user_data)
-            
-            # Commit transaction
-            connection.commit()
-            logger.info(f"User {user_data['email']} registered successfully")
+            # Generate folder name for future file uploads (solo si el registro tuvo éxito)
+            folder_name = generate_folder_name(body['ci'], body['full_name'], date_str)
+            logger.info("Generated folder name for future uploads: %s", folder_name)
             
-            response_data = {
-                'success': True,
-                'user_id': user_id,
-                'message': 'User registered successfully',
-                'data': {
-                    'email': user_data['email'],
-                    'full_name': user_data['full_name'],
-                    'ci': user_data['ci'],
-                    'phone1': user_data['phone1'],
-                    'folder_name': folder_name,
-                    'files_uploaded': False,
-                    'next_step': 'Upload documents using /users/upload-documents endpoint'
-                },
-                'environment': os.environ.get('ENVIRONMENT', 'unknown'),
-                'timestamp': datetime.now().isoformat()
-            }
+            # Cada valor se serializa por separado para escaparlo como JSON
+            response_body = _SUCCESS_BODY_TMPL % (
+                _json_dumps(user_id),
+                _json_dumps(email),
+                _json_dumps(body['full_name']),
+                _json_dumps(body['ci']),
+                _json_dumps(body['phone1']),
+                _json_dumps(folder_name),
+                _json_dumps(os.environ.get('ENVIRONMENT', 'unknown')),
+                _json_dumps(now.isoformat())
+            )
             
             return {
                 'statusCode': 201,
-                'headers': cors_headers,
-                'body': json.dumps(response_data)
+                'headers': _CORS_HEADERS,
+                'body': response_body
             }
             
         except Exception as e:
-            logger.error(f"Database transaction failed: {str(e)}", exc_info=True)
+            logger.error("Database operation failed: %s", e, exc_info=True)
             
-            # Rollback database changes
-            if connection:
-                try:
-                    connection.rollback()
-                    logger.info("Database transaction rolled back")
-                except Exception as rollback_error:
-                    logger.error(f"Error during rollback: {str(rollback_error)}")
+            # Si la conexión quedó en mal estado, la próxima invocación la recrea
+            if isinstance(e, pymysql.MySQLError):
+                _CONN = None
             
             return {
                 'statusCode': 500,
-                'headers': cors_headers,
-                'body': json.dumps({
-                    'error': 'Registration failed',
-                    'message': 'User registration could not be completed'
-                })
+                'headers': _CORS_HEADERS,
+                'body': _REGISTRATION_FAILED_ERROR
             }
-            
-        finally:
-            if connection:
-                connection.close()
-                logger.info("Database connection closed")
                 
     except Exception as e:
-        logger.error(f"Unhandled error: {str(e)}", exc_info=True)
+        logger.error("Unhandled error: %s", e, exc_info=True)
         return {
             'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-            },
-            'body': json.dumps({
+            'headers': _ERROR_CORS_HEADERS,
+            'body': _json_dumps({
                 'error': 'Internal server error',
                 'message': str(e)
             })
         }
 
-def prepare_user_data(body, user_id):
+def prepare_user_data(body, user_id, now):
     """
-    Prepara los datos del usuario para inserción en la base de datos (solo texto)
+    Prepara los datos del usuario para inserción en la base de datos (solo texto).
+    Devuelve la tupla de parámetros en el orden de _INSERT_USER_COLUMNS
     """
-    now = datetime.now()
-    
-    user_data = {
-        'id': user_id,
-        'email': body.get('email', '').strip().lower(),
-        'full_name': body.get('full_name'),
-        'birth_date': body.get('birth_date'),
-        'ci': body.get('ci'),
-        'phone1': body.get('phone1'),
-        'phone2': body.get('phone2'),
-        'address': body.get('address'),
-        'instagram': body.get('instagram'),
-        'facebook': body.get('facebook'),
-        'tiktok': body.get('tiktok'),
-        'ref1_name': body.get('ref1_name'),
-        'ref1_relation': body.get('ref1_relation'),
-        'ref2_name': body.get('ref2_name'),
-        'ref2_relation': body.get('ref2_relation'),
-        'monthly_income': float(body.get('monthly_income', 0)) if body.get('monthly_income') else None,
-        'activity_type': body.get('activity_type'),
-        'position': body.get('position'),
-        'created_at': now,
-        'updated_at': now,
+    monthly_income = body.get('monthly_income')
+    return (
+        user_id,
+        body.get('email', '').strip().lower(),
+        body.get('full_name'),
+        body.get('birth_date'),
+        body.get('ci'),
+        body.get('phone1'),
+        body.get('phone2'),
+        body.get('address'),
+        body.get('instagram'),
+        body.get('facebook'),
+        body.get('tiktok'),
+        body.get('ref1_name'),
+        body.get('ref1_relation'),
+        body.get('ref2_name'),
+        body.get('ref2_relation'),
+        float(monthly_income) if monthly_income else None,
+        body.get('activity_type'),
+        body.get('position'),
         # Archivos se setean como NULL por defecto
-        'id_file_path': None,
-        'rif_file_path': None,
-        'ref1_id_path': None,
-        'ref2_id_path': None,
-        'work_cert_path': None,
-        'files_uploaded': False,
-        'files_upload_date': None
+        None,   # id_file_path
+        None,   # rif_file_path
+        None,   # ref1_id_path
+        None,   # ref2_id_path
+        None,   # work_cert_path
+        False,  # files_uploaded
+        None,   # files_upload_date
+        now,    # created_at
+        now     # updated_at
+    )
+
+@functools.lru_cache(maxsize=1)
+def _db_creds():
+    """
+    Credenciales de MySQL, leídas del entorno una vez por contenedor. Si pasan
+    a SSM/Secrets Manager, basta con cambiar el cuerpo: sigue cacheado
+    """
+    return {
+        'host': os.environ.get('DB_HOST'),
+        'user': os.environ.get('DB_USER'),
+        'password': os.environ.get('DB_PASS'),
+        'database': os.environ.get('DB_NAME', 'impulsame_dev')
     }
-    
-    return user_data
 
 def get_database_connection():
     """
-    Establece conexión con la base de datos MySQL
+    Devuelve la conexión MySQL del contenedor, creándola solo si no existe
+    o si se cerró. Se reutiliza entre invocaciones en caliente.
     """
+    global _CONN
+    if _CONN is not None and _CONN.open:
+        try:
+            sock = getattr(_CONN, '_sock', None)
+            _CONN.ping(reconnect=True)
+            # Si ping reconectó hay socket nuevo: también necesita keepalive
+            if getattr(_CONN, '_sock', None) is not sock:
+                enable_tcp_keepalive(_CONN)
+            return _CONN
+        except pymysql.MySQLError as e:
+            # Socket muerto tras el freeze del contenedor: se descarta y se reconecta
+            logger.warning("Cached database connection is stale, reconnecting: %s", e)
+            _CONN = None
+    
     try:
-        connection = pymysql.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            database=DB_NAME,
+        _CONN = pymysql.connect(
+            **_db_creds(),
             charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=False  # Para manejar transacciones manualmente
+            cursorclass=pymysql.cursors.Cursor,  # Filas como tuplas: sin dict por fila
+            autocommit=True,  # Un solo INSERT por registro: sin COMMIT explícito
+            connect_timeout=3,
+            read_timeout=5,
+            write_timeout=5
         )
+        enable_tcp_keepalive(_CONN)
         logger.info("Database connection established")
-        return connection
+        return _CONN
     except Exception as e:
-        logger.error(f"Database connection failed: {str(e)}")
+        _CONN = None
+        logger.error("Database connection failed: %s", e)
         raise e
 
-def insert_user_to_database(connection, user_data):
+def enable_tcp_keepalive(connection):
     """
-    Inserta el usuario en la base de datos (solo datos de texto)
+    Activa TCP keepalive en el socket de la conexión para que NAT/RDS no la
+    descarten en silencio mientras el contenedor está congelado
     """
+    # Atributo interno de pymysql; si no está (p. ej. un stub), no se ajusta nada
+    sock = getattr(connection, '_sock', None)
+    if sock is None:
+        return
     try:
-        with connection.cursor() as cursor:
-            # SQL para insertar usuario
-            sql = """
-            INSERT INTO users (
-                id, email, full_name, birth_date, ci, phone1, phone2, address,
-                instagram, facebook, tiktok, ref1_name, ref1_relation, ref2_name, ref2_relation,
-                monthly_income, activity_type, position, id_file_path, rif_file_path,
-                ref1_id_path, ref2_id_path, work_cert_path, files_uploaded, files_upload_date,
-                created_at, updated_at
-            ) VALUES (
-                %(id)s, %(email)s, %(full_name)s, %(birth_date)s, %(ci)s, %(phone1)s, %(phone2)s, %(address)s,
-                %(instagram)s, %(facebook)s, %(tiktok)s, %(ref1_name)s, %(ref1_relation)s, %(ref2_name)s, %(ref2_relation)s,
-                %(monthly_income)s, %(activity_type)s, %(position)s, %(id_file_path)s, %(rif_file_path)s,
-                %(ref1_id_path)s, %(ref2_id_path)s, %(work_cert_path)s, %(files_uploaded)s, %(files_upload_date)s,
-                %(created_at)s, %(updated_at)s
-            )
-            """
-            
-            cursor.execute(sql, user_data)
-            logger.info(f"User inserted into database with ID: {user_data['id']}")
-            
-    except Exception as e:
-        logger.error(f"Database insertion failed: {str(e)}")
-        raise e
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)
+        if hasattr(socket, 'TCP_KEEPINTVL'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 30)
+        if hasattr(socket, 'TCP_KEEPCNT'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+    except OSError as e:
+        logger.warning("Could not enable TCP keepalive: %s", e)
 
-def email_exists(connection, email):
+def insert_user_to_database(connection, params):
     """
-    Verifica si el email ya existe en la base de datos
+    Inserta el usuario en la base de datos (solo datos de texto).
+    params es la tupla devuelta por prepare_user_data
     """
     try:
         with connection.cursor() as cursor:
-            sql = "SELECT COUNT(*) as count FROM users WHERE email = %s"
-            cursor.execute(sql, (email,))
-            result = cursor.fetchone()
-            return result['count'] > 0
+            cursor.execute(_INSERT_USER_SQL, params)
+            logger.info("User inserted into database with ID: %s", params[0])
+            
     except Exception as e:
-        logger.error(f"Error checking email existence: {str(e)}")
+        logger.error("Database insertion failed: %s", e)
         raise e
 
-def ci_exists(connection, ci):
+def find_existing_user(connection, email, ci):
     """
-    Verifica si la CI ya existe en la base de datos
+    Verifica en una sola consulta si el email o la CI ya existen.
+    Retorna 'email', 'ci' o None (el email tiene prioridad, como antes)
     """
     try:
         with connection.cursor() as cursor:
-            sql = "SELECT COUNT(*) as count FROM users WHERE ci = %s"
-            cursor.execute(sql, (ci,))
-            result = cursor.fetchone()
-            return result['count'] > 0
+            sql = "SELECT email, ci FROM users WHERE email = %s OR ci = %s LIMIT 2"
+            cursor.execute(sql, (email, ci))
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+            if any((row[0] or '').lower() == email for row in rows):
+                return 'email'
+            return 'ci'
     except Exception as e:
-        logger.error(f"Error checking CI existence: {str(e)}")
+        logger.error("Error checking user existence: %s", e)
         raise e
 
+def duplicate_key_field(error):
+    """
+    Traduce un IntegrityError de clave duplicada (1062) al campo en conflicto.
+    Retorna 'email', 'ci' o None si no es un error de duplicado
+    """
+    if not error.args or error.args[0] != ER_DUP_ENTRY:
+        return None
+    # Mensaje: "Duplicate entry '<valor>' for key '<índice>'"; MySQL 8 antepone
+    # la tabla ('users.ci'), así que se compara solo el nombre del índice
+    key_name = str(error.args[-1]).rsplit(' for key ', 1)[-1].strip("'").lower()
+    return _DUP_KEY_FIELDS.get(key_name.rsplit('.', 1)[-1])
+
 # Funciones de utilidad para archivos (para futuro endpoint de upload)
 def clean_name(name):
     """
     Limpia el nombre dejando solo caracteres ASCII 65-90 (A-Z) y 97-122 (a-z)
     Capitaliza la primera letra de cada palabra y separa con guión bajo
     """
-    # Remover caracteres no ASCII válidos
-    clean_chars = []
-    for char in name:
-        if (65 <= ord(char) <= 90) or (97 <= ord(char) <= 122) or char == ' ':
-            clean_chars.append(char)
-    
-    clean_name = ''.join(clean_chars)
+    # Remover caracteres no ASCII válidos (en C: encode descarta no-ASCII,
+    # translate borra el resto de símbolos)
+    cleaned = name.encode('ascii', 'ignore').decode('ascii').translate(_CLEAN_NAME_TABLE)
     
     # Dividir por espacios, capitalizar y unir con guión bajo
-    words = [word.capitalize() for word in clean_name.split() if word]
-    return '_'.join(words)
+    return '_'.join(word.capitalize() for word in cleaned.split())
 
-def generate_folder_name(ci, full_name):
+def folder_date_str(now):
+    """
+    Devuelve la fecha de now en formato ddmmaaaa, reutilizando el último
+    strftime mientras no cambie el día
+    """
+    day = now.date()
+    if _DATE_CACHE[0] != day:
+        _DATE_CACHE[:] = [day, now.strftime("%d%m%Y")]
+    return _DATE_CACHE[1]
+
+def generate_folder_name(ci, full_name, date_str):
     """
     Genera el nombre de la carpeta: ddmmaaaa-cedula-nombre_limpio
     Para futuro uso en endpoint de upload de archivos
+    date_str: fecha de la invocación en formato ddmmaaaa
     """
-    # Fecha actual en formato ddmmaaaa
-    now = datetime.now()
-    date_str = now.strftime("%d%m%Y")
-    
     # Limpiar nombre
     cleaned_name = clean_name(full_name)
     
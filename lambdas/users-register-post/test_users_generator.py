@@ -5,12 +5,18 @@ Genera datos aleatorios pero realistas para testing
 """
 
 import json
+import os
 import random
+import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List
 
 class TestUserGenerator:
-    def __init__(self):
+    def __init__(self, seed: int = None):
+        # PRNG propio: no comparte estado con el módulo random y permite
+        # reproducir una tanda de usuarios pasando una semilla
+        self.rng = random.Random(seed)
+        
         self.nombres = [
             "Carlos Alberto", "María Elena", "José Antonio", "Ana Gabriela", 
             "Luis Fernando", "Carmen Rosa", "Pedro Pablo", "Luisa Fernanda",
@@ -46,106 +52,126 @@ class TestUserGenerator:
         
         self.relaciones = ["amigo", "familiar", "colega", "vecino", "conocido"]
 
-    def generar_ci(self) -> str:
-        """Genera una cédula venezolana aleatoria"""
-        letra = random.choice(['V', 'E'])
-        numero = random.randint(5000000, 35000000)
-        return f"{letra}-{numero}"
-
-    def generar_telefono(self) -> str:
-        """Genera un número de teléfono venezolano"""
-        prefijos = ['0414', '0424', '0416', '0426', '0412']
-        prefijo = random.choice(prefijos)
-        numero = random.randint(1000000, 9999999)
-        return f"{prefijo}{numero}"
-
-    def generar_fecha_nacimiento(self) -> str:
-        """Genera fecha de nacimiento entre 18 y 65 años"""
-        hoy = datetime.now()
-        edad_min = 18
-        edad_max = 65
-        
-        fecha_max = hoy - timedelta(days=edad_min * 365)
-        fecha_min = hoy - timedelta(days=edad_max * 365)
-        
-        dias_diferencia = (fecha_max - fecha_min).days
-        dias_random = random.randint(0, dias_diferencia)
-        
-        fecha_nacimiento = fecha_min + timedelta(days=dias_random)
-        return fecha_nacimiento.strftime("%Y-%m-%d")
-
-    def generar_ingreso_mensual(self, actividad: str) -> float:
-        """Genera ingreso mensual según el tipo de actividad"""
-        if actividad == "dependencia":
-            return round(random.uniform(300, 2500), 2)
-        else:  # negocio
-            return round(random.uniform(200, 3500), 2)
-
-    def generar_redes_sociales(self, nombre: str) -> Dict[str, str]:
-        """Genera handles de redes sociales basados en el nombre"""
-        nombre_clean = nombre.replace(" ", "").lower()
-        sufijo = random.randint(10, 999)
-        
-        return {
-            "instagram": f"@{nombre_clean}{sufijo}",
-            "facebook": f"{nombre_clean}.{sufijo}",
-            "tiktok": f"@{nombre_clean}_oficial" if random.choice([True, False]) else None
-        }
-
     def generar_usuario(self, email_prefix: str = None) -> Dict:
         """Genera un usuario completo con datos aleatorios"""
-        nombre = random.choice(self.nombres)
-        apellido = random.choice(self.apellidos)
-        full_name = f"{nombre} {apellido}"
-        
-        # Email único
-        if email_prefix:
-            email = f"{email_prefix}@impulsame.com"
-        else:
-            nombre_email = nombre.replace(" ", "").lower()
-            apellido_email = apellido.lower()
-            timestamp = datetime.now().strftime("%m%d%H%M")
-            email = f"{nombre_email}.{apellido_email}.{timestamp}@impulsame.com"
-
-        # Actividad y posición
-        actividad = random.choice(self.actividades)
-        if actividad == "dependencia":
-            posicion = random.choice(self.posiciones_dependencia)
-        else:
-            posicion = random.choice(self.posiciones_negocio)
-
-        # Dirección
-        sector = random.choice(self.sectores)
-        ciudad = random.choice(self.ciudades)
-        numero = random.randint(1, 999)
-        direccion = f"{sector}, Casa #{numero}, {ciudad}"
-
-        # Referencias
-        ref1_nombre = f"{random.choice(self.nombres)} {random.choice(self.apellidos)}"
-        ref2_nombre = f"{random.choice(self.nombres)} {random.choice(self.apellidos)}"
-
-        # Redes sociales
-        redes = self.generar_redes_sociales(nombre)
-
-        return {
-            "email": email,
-            "full_name": full_name,
-            "birth_date": self.generar_fecha_nacimiento(),
-            "ci": self.generar_ci(),
-            "phone1": self.generar_telefono(),
-            "phone2": self.generar_telefono() if random.choice([True, False]) else None,
-            "address": direccion,
-            "instagram": redes["instagram"],
-            "facebook": redes["facebook"],
-            "tiktok": redes["tiktok"],
-            "ref1_name": ref1_nombre,
-            "ref1_relation": random.choice(self.relaciones),
-            "ref2_name": ref2_nombre,
-            "ref2_relation": random.choice(self.relaciones),
-            "monthly_income": str(self.generar_ingreso_mensual(actividad)),
-            "activity_type": actividad,
-            "position": posicion
-        }
+        prefijos = [email_prefix] if email_prefix else None
+        return self.generar_usuarios(1, prefijos)[0]
+
+    def generar_usuarios(self, n: int, email_prefixes: List[str] = None) -> List[Dict]:
+        """
+        Genera n usuarios de una vez: cada campo aleatorio se muestrea en bloque
+        con self.rng.choices(k=n) en lugar de una llamada por usuario y campo
+        """
+        choices = self.rng.choices
+        nombres = choices(self.nombres, k=n)
+        apellidos = choices(self.apellidos, k=n)
+        actividades = choices(self.actividades, k=n)
+        posiciones_dependencia = choices(self.posiciones_dependencia, k=n)
+        posiciones_negocio = choices(self.posiciones_negocio, k=n)
+
+        # Cédulas venezolanas (V/E) y teléfonos móviles
+        letras_ci = choices(['V', 'E'], k=n)
+        numeros_ci = choices(range(5000000, 35000001), k=n)
+        prefijos_tel = choices(['0414', '0424', '0416', '0426', '0412'], k=2 * n)
+        numeros_tel = choices(range(1000000, 10000000), k=2 * n)
+        con_phone2 = choices([True, False], k=n)
+
+        # Fecha de nacimiento entre 18 y 65 años
+        hoy = datetime.now()
+        fecha_min = hoy - timedelta(days=65 * 365)
+        dias_diferencia = (hoy - timedelta(days=18 * 365) - fecha_min).days
+        dias_nacimiento = choices(range(dias_diferencia + 1), k=n)
+
+        # Dirección, referencias y redes sociales
+        sectores = choices(self.sectores, k=n)
+        ciudades = choices(self.ciudades, k=n)
+        numeros_casa = choices(range(1, 1000), k=n)
+        ref_nombres = choices(self.nombres, k=2 * n)
+        ref_apellidos = choices(self.apellidos, k=2 * n)
+        relaciones = choices(self.relaciones, k=2 * n)
+        sufijos = choices(range(10, 1000), k=n)
+        con_tiktok = choices([True, False], k=n)
+        aleatorio = self.rng.random
+        azar = [aleatorio() for _ in range(n)]
+
+        timestamp = hoy.strftime("%m%d%H%M")
+        # Token aleatorio por tanda + índice: emails únicos dentro de la tanda
+        # y, salvo colisión del token, entre tandas del mismo minuto
+        lote = f"{self.rng.getrandbits(24):06x}"
+        usuarios = []
+        for i in range(n):
+            nombre = nombres[i]
+            apellido = apellidos[i]
+            nombre_clean = nombre.replace(" ", "").lower()
+
+            # Email único
+            if email_prefixes:
+                email = f"{email_prefixes[i]}@impulsame.com"
+            else:
+                email = f"{nombre_clean}.{apellido.lower()}.{timestamp}.{lote}-{i}@impulsame.com"
+
+            # Actividad, posición e ingreso (dependencia 300-2500, negocio 200-3500)
+            actividad = actividades[i]
+            if actividad == "dependencia":
+                posicion = posiciones_dependencia[i]
+                ingreso = round(300 + azar[i] * 2200, 2)
+            else:
+                posicion = posiciones_negocio[i]
+                ingreso = round(200 + azar[i] * 3300, 2)
+
+            sufijo = sufijos[i]
+            usuarios.append({
+                "email": email,
+                "full_name": f"{nombre} {apellido}",
+                "birth_date": (fecha_min + timedelta(days=dias_nacimiento[i])).strftime("%Y-%m-%d"),
+                "ci": f"{letras_ci[i]}-{numeros_ci[i]}",
+                "phone1": f"{prefijos_tel[i]}{numeros_tel[i]}",
+                "phone2": f"{prefijos_tel[n + i]}{numeros_tel[n + i]}" if con_phone2[i] else None,
+                "address": f"{sectores[i]}, Casa #{numeros_casa[i]}, {ciudades[i]}",
+                "instagram": f"@{nombre_clean}{sufijo}",
+                "facebook": f"{nombre_clean}.{sufijo}",
+                "tiktok": f"@{nombre_clean}_oficial" if con_tiktok[i] else None,
+                "ref1_name": f"{ref_nombres[i]} {ref_apellidos[i]}",
+                "ref1_relation": relaciones[i],
+                "ref2_name": f"{ref_nombres[n + i]} {ref_apellidos[n + i]}",
+                "ref2_relation": relaciones[n + i],
+                "monthly_income": str(ingreso),
+                "activity_type": actividad,
+                "position": posicion
+            })
+
+        return usuarios
+
+    def insertar_usuarios_db(self, usuarios: List[Dict]) -> int:
+        """
+        Carga la tanda directo en MySQL (pruebas de estrés), sin pasar por el API.
+        Abre su propia conexión (DB_HOST/DB_USER/DB_PASS/DB_NAME) y usa executemany,
+        que pymysql reescribe como INSERT multi-VALUES, en una sola transacción
+        """
+        # Importes diferidos: el resto del script no necesita pymysql
+        import pymysql
+        from lambda_function import _INSERT_USER_SQL, prepare_user_data
+
+        ahora = datetime.now()
+        params = [prepare_user_data(usuario, uuid.uuid4().hex, ahora) for usuario in usuarios]
+
+        connection = pymysql.connect(
+            host=os.environ.get('DB_HOST'),
+            user=os.environ.get('DB_USER'),
+            password=os.environ.get('DB_PASS'),
+            database=os.environ.get('DB_NAME', 'impulsame_dev'),
+            charset='utf8mb4'
+        )
+        try:
+            with connection.cursor() as cursor:
+                insertados = cursor.executemany(_INSERT_USER_SQL, params)
+            connection.commit()
+            return insertados
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
 
     def generar_curl_command(self, usuario: Dict, api_endpoint: str) -> str:
         """Genera comando curl para probar el API"""
@@ -173,7 +199,7 @@ class TestUserGenerator:
             "body": json.dumps(usuario, ensure_ascii=False),
             "isBase64Encoded": False,
             "requestContext": {
-                "requestId": f"test-request-{random.randint(100, 999)}",
+                "requestId": f"test-request-{self.rng.randint(100, 999)}",
                 "stage": "dev",
                 "httpMethod": "POST",
                 "path": "/users/register",
@@ -192,15 +218,18 @@ def main():
     # Configuración
     API_ENDPOINT = "https://zkmeuo2c8.execute-api.us-east-1.amazonaws.com/dev"  # Cambiar por tu endpoint real
     CANTIDAD_USUARIOS = 5
+    INSERTAR_EN_DB = False  # True para cargar la tanda directo en MySQL (variables DB_*)
     
     print("=== GENERADOR DE USUARIOS DE PRUEBA ===\n")
     
-    for i in range(1, CANTIDAD_USUARIOS + 1):
+    # Generar todos los usuarios en bloque
+    usuarios = generator.generar_usuarios(
+        CANTIDAD_USUARIOS, [f"test{i}" for i in range(1, CANTIDAD_USUARIOS + 1)]
+    )
+    
+    for i, usuario in enumerate(usuarios, 1):
         print(f"--- USUARIO {i} ---")
         
-        # Generar usuario
-        usuario = generator.generar_usuario(f"test{i}")
-        
         # Mostrar datos del usuario
         print("📋 Datos del usuario:")
         print(f"  Email: {usuario['email']}")
@@ -222,6 +251,10 @@ def main():
         
         print("\n" + "="*80 + "\n")
 
+    if INSERTAR_EN_DB:
+        insertados = generator.insertar_usuarios_db(usuarios)
+        print(f"🗄️  {insertados} usuarios insertados en la base de datos\n")
+
     print("✅ Usuarios generados exitosamente!")
     print(f"💡 Recuerda cambiar el API_ENDPOINT por tu URL real de API Gateway")
 